@@ -0,0 +1,35 @@
+# cython: language_level=3
+# _schema_split.pyx
+# Compiled twin of schema_parser._split_top_level_commas (same rules, C loop).
+# Build in place with:  cythonize -i _schema_split.pyx
+# schema_parser falls back to the pure-Python version when this isn't built.
+
+
+def split_top_level_commas(str body):
+    cdef Py_ssize_t i, last = 0, n = len(body)
+    cdef int depth = 0
+    cdef bint in_str = False
+    cdef Py_UCS4 ch, prev = 0
+
+    parts = []
+
+    for i in range(n):
+        ch = body[i]
+        if ch == u"'" and prev != u"\\":
+            in_str = not in_str
+        elif not in_str:
+            if ch == u"(":
+                depth += 1
+            elif ch == u")":
+                if depth > 0:
+                    depth -= 1
+            elif ch == u"," and depth == 0:
+                parts.append(body[last:i].strip())
+                last = i + 1
+        prev = ch
+
+    tail = body[last:].strip()
+    if tail:
+        parts.append(tail)
+
+    return parts
@@ -1,58 +1,213 @@
 # app.py
+import asyncio
+import hashlib
 import json
 import os
 import time
-import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
 import re
 
 import secrets
+import orjson
 from datetime import date
+from itertools import islice
 
-from fastapi import HTTPException, Request, Response
+from fastapi import BackgroundTasks, HTTPException, Request, Response
 from starlette import status
 from fastapi import FastAPI, UploadFile, File
 from pydantic import BaseModel
-from openai import OpenAI, RateLimitError
+import httpx
+from openai import AsyncOpenAI, RateLimitError
 
-from schema_parser import parse_schema_sql, to_schema_json
+from schema_parser import parse_schema_sql, to_schema_json, normalize_schema
 from validator import validate_against_schema, classify_issue
 
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 from fastapi.staticfiles import StaticFiles
 
 
 # ---------------------------------------------------------
 # OpenAI client + deterministic retry wrapper
 # ---------------------------------------------------------
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-def call_openai_with_retry(fn, retries: int = 3, base_sleep: float = 1.0):
+# One long-lived pool for every OpenAI call (keep-alive, no per-request TLS)
+_http = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=30),
+    timeout=httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0),
+    http2=True,
+)
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=_http)
+
+class TokenBucket:
+    """Paces callers to rate_per_min, allowing short bursts up to capacity."""
+
+    def __init__(self, rate_per_min: float, capacity: float | None = None):
+        if rate_per_min <= 0:
+            raise ValueError(f"rate_per_min must be positive, got {rate_per_min}")
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Proactive throttle: bursts wait locally instead of bouncing off 429 + backoff.
+# OPENAI_RPM=0 turns the throttle off; negative values are rejected at startup.
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "500"))
+if OPENAI_RPM < 0:
+    raise ValueError(f"OPENAI_RPM must be >= 0 (0 = unthrottled), got {OPENAI_RPM}")
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "20"))
+_openai_sem = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+_openai_bucket = TokenBucket(OPENAI_RPM) if OPENAI_RPM else None
+
+async def call_openai_with_retry(fn, retries: int = 3, base_sleep: float = 1.0):
+    # fn is a zero-arg factory returning a fresh coroutine per attempt
     last_err = None
     for i in range(retries):
         try:
-            return fn()
+            async with _openai_sem:
+                if _openai_bucket is not None:
+                    await _openai_bucket.acquire()
+                return await fn()
         except RateLimitError as e:
             last_err = e
-            time.sleep(base_sleep * (2 ** i))
+            await asyncio.sleep(base_sleep * (2 ** i))
     raise last_err
 
 
 # ---------------------------------------------------------
 # FastAPI + schema storage
 # ---------------------------------------------------------
-app = FastAPI(title="QueryWave MVP")
-templates = Jinja2Templates(directory="templates")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # open the TLS connection before the first user request needs it
+    try:
+        await client.models.list()
+    except Exception:
+        pass  # no key / offline: first /generate will connect lazily
+    try:
+        yield
+    finally:
+        await _http.aclose()
+
+app = FastAPI(title="QueryWave MVP", lifespan=lifespan)
+# Templates only change on deploy: no per-request stat/reload check, and
+# compiled bytecode is cached on disk for faster worker start-up
+templates = Jinja2Templates(env=Environment(
+    loader=FileSystemLoader("templates"),
+    autoescape=select_autoescape(),
+    auto_reload=False,
+    bytecode_cache=FileSystemBytecodeCache(),
+))
 app.mount("/static", StaticFiles(directory="static"), name="static")
-SCHEMAS: dict[str, dict] = {}
+
+# In-memory LRU caches; the JSON files in SCHEMA_DIR are the source of truth
+SCHEMAS_MAX = 256
+SCHEMAS: OrderedDict[str, dict] = OrderedDict()
+SCHEMA_SUMMARIES: OrderedDict[str, str] = OrderedDict()  # schema_id -> schema_summary() text (schemas are immutable)
 SCHEMA_DIR = Path("schemas")
 SCHEMA_DIR.mkdir(exist_ok=True)
+PARSE_CACHE_DIR = SCHEMA_DIR / "_parse_cache"  # sha256(upload bytes) -> parsed schema
+PARSE_CACHE_DIR.mkdir(exist_ok=True)
+# Bump whenever parse_schema_sql/normalize_schema output changes so stale parses are not served
+PARSE_CACHE_VERSION = 1
+PARSE_CACHE_MAX = 512  # newest entries kept (by mtime; cache hits refresh it)
+PARSE_CACHE_TMP_MAX_AGE = 3600  # seconds before an abandoned .tmp is removed
+
+def prune_parse_cache() -> None:
+    """Drop other versions' entries and all but the newest PARSE_CACHE_MAX files."""
+    prefix = f"v{PARSE_CACHE_VERSION}-"
+    now = time.time()
+    entries = []
+    for p in PARSE_CACHE_DIR.iterdir():
+        try:
+            if not p.name.startswith(prefix):
+                p.unlink(missing_ok=True)
+            elif p.suffix == ".tmp":
+                # may be another worker's write in flight; only clear leftovers
+                if now - p.stat().st_mtime > PARSE_CACHE_TMP_MAX_AGE:
+                    p.unlink(missing_ok=True)
+            else:
+                entries.append((p.stat().st_mtime, p))
+        except FileNotFoundError:
+            pass  # pruned concurrently by another worker
+    entries.sort(reverse=True)
+    for _, p in entries[PARSE_CACHE_MAX:]:
+        p.unlink(missing_ok=True)
+
+prune_parse_cache()
+
+def lru_get(cache: OrderedDict, key: str):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+def lru_put(cache: OrderedDict, key: str, value) -> None:
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > SCHEMAS_MAX:
+        cache.popitem(last=False)
+
+
+# ---------------------------------------------------------
+# Optional Redis: shared usage counters + schema cache across workers
+# (set REDIS_URL; without it everything stays in-process)
+# ---------------------------------------------------------
+REDIS_URL = os.getenv("REDIS_URL")
+SCHEMA_TTL_SECONDS = 86400
+USAGE_TTL_SECONDS = 90000  # a day plus slack so counters outlive the date rollover
+
+if REDIS_URL:
+    import redis.asyncio as aioredis
+    rds = aioredis.Redis(connection_pool=aioredis.ConnectionPool.from_url(REDIS_URL, max_connections=50))
+else:
+    rds = None
+
+def schema_cache_key(schema_id: str) -> str:
+    return f"qw:schema:{schema_id}"
+
+async def load_schema(schema_id: str) -> dict | None:
+    schema_json = lru_get(SCHEMAS, schema_id)
+    if schema_json:
+        return schema_json
+
+    if rds is not None:
+        raw = await rds.get(schema_cache_key(schema_id))
+        if raw:
+            schema_json = orjson.loads(raw)
+
+    if not schema_json:
+        p = SCHEMA_DIR / f"{schema_id}.json"
+        if not p.exists():
+            return None
+        # files written before normalize_schema existed may use older shapes
+        schema_json = normalize_schema(orjson.loads(p.read_bytes()))
+        if rds is not None:
+            await rds.set(schema_cache_key(schema_id), orjson.dumps(schema_json), ex=SCHEMA_TTL_SECONDS)
+
+    lru_put(SCHEMAS, schema_id, schema_json)
+    return schema_json
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request, response: Response):
     cid = get_or_set_client_id(request, response)
-    bucket = get_usage_bucket(cid)
+    bucket = await get_usage_bucket(cid)
 
     return templates.TemplateResponse(
         "index.html",
@@ -68,6 +223,7 @@ async def home(request: Request, response: Response):
 # -------- Phase 5 stability limits --------
 MAX_UPLOAD_MB = 1
 MAX_UPLOAD_BYTES = MAX_UPLOAD_MB * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 64 * 1024
 
 MAX_TABLES = 200
 MAX_TOTAL_COLUMNS = 5000
@@ -94,65 +250,102 @@ def get_or_set_client_id(request: Request, response: Response) -> str:
         response.set_cookie(CLIENT_COOKIE, cid, httponly=True, samesite="lax")
     return cid
 
-def get_usage_bucket(cid: str) -> dict:
+def usage_key(tk: str, cid: str) -> str:
+    return f"qw:usage:{tk}:{cid}"
+
+def memory_usage_bucket(cid: str) -> dict:
     tk = today_key()
+    # drop previous days' counters so USAGE doesn't grow until restart
+    for stale in [k for k in USAGE if k != tk]:
+        del USAGE[stale]
     day = USAGE.setdefault(tk, {})
     return day.setdefault(cid, {"schemas": 0, "generates": 0})
 
-def require_limit(bucket: dict, field: str, limit: int, label: str):
-    if bucket.get(field, 0) >= limit:
+async def get_usage_bucket(cid: str) -> dict:
+    if rds is not None:
+        raw = await rds.hgetall(usage_key(today_key(), cid))
+        return {
+            "schemas": int(raw.get(b"schemas", 0)),
+            "generates": int(raw.get(b"generates", 0)),
+        }
+    return memory_usage_bucket(cid)
+
+async def reserve_usage(cid: str, field: str, limit: int, label: str) -> int:
+    """
+    Claim one of today's slots for cid before doing the work and return the new
+    count. Increment-then-compare, so concurrent requests (and workers) cannot
+    all pass a read-only check; over the limit the slot is handed back and 429 raised.
+    """
+    if rds is not None:
+        key = usage_key(today_key(), cid)
+        async with rds.pipeline(transaction=True) as pipe:
+            pipe.hincrby(key, field, 1)
+            pipe.expire(key, USAGE_TTL_SECONDS)
+            count, _ = await pipe.execute()
+    else:
+        # no await between read and write, so this is atomic on the event loop
+        bucket = memory_usage_bucket(cid)
+        bucket[field] += 1
+        count = bucket[field]
+
+    if count > limit:
+        await release_usage(cid, field)
         raise HTTPException(
             status_code=429,
             detail=f"Usage limit reached: {label} ({limit}/day)."
         )
+    return count
+
+async def release_usage(cid: str, field: str) -> None:
+    """Refund a slot taken by reserve_usage() for a request that should not count."""
+    if rds is not None:
+        await rds.hincrby(usage_key(today_key(), cid), field, -1)
+        return
+    bucket = memory_usage_bucket(cid)
+    bucket[field] = max(0, bucket[field] - 1)
 
 
 # ---------------------------------------------------------
 # Schema summary for AI (PK / FK / NOT NULL / types)
 # ---------------------------------------------------------
 def schema_summary(schema_json: dict) -> str:
-    tables = (schema_json or {}).get("tables", {}) or {}
+    # expects the normalize_schema() shape
+    tables = (schema_json or {}).get("tables", {})
     out: list[str] = []
 
     for table_name, meta in tables.items():
-        meta = meta or {}
-        cols = meta.get("columns", {}) or {}
-
-        pk = set(meta.get("primary_key") or [])
-        nn = set(meta.get("not_null") or [])
-        fks = meta.get("foreign_keys") or []
-
-        col_bits = []
-        for col_name, col_meta in cols.items():
-            if isinstance(col_meta, dict):
-                col_type = col_meta.get("type") or col_meta.get("data_type") or "UNKNOWN"
-            else:
-                col_type = str(col_meta)
-
-            flags = []
+        cols = meta["columns"]
+
+        pk = set(meta["primary_key"])
+        nn = set(meta.get("not_null") or ())
+        fks = meta["foreign_keys"]
+
+        # flat segment list joined once per table; only the first 40 columns are shown
+        col_bits: list[str] = []
+        append = col_bits.append
+        for col_name, col_type in islice(cols.items(), 40):
+            append(col_name)
+            append(":")
+            append(col_type)
             if col_name in pk:
-                flags.append("PK")
-            if col_name in nn:
-                flags.append("NN")
-
-            flag_txt = f" [{' '.join(flags)}]" if flags else ""
-            col_bits.append(f"{col_name}:{col_type}{flag_txt}")
-
-        col_bits = col_bits[:40]
+                append(" [PK NN]" if col_name in nn else " [PK]")
+            elif col_name in nn:
+                append(" [NN]")
+            append(", ")
 
         out.append(f"TABLE {table_name}")
-        out.append("  COLUMNS: " + ", ".join(col_bits) if col_bits else "  COLUMNS: (none)")
+        if col_bits:
+            col_bits.pop()  # trailing ", "
+            out.append("  COLUMNS: " + "".join(col_bits))
+        else:
+            out.append("  COLUMNS: (none)")
 
         if fks:
-            fk_bits = []
-            for fk in fks[:30]:
-                c = fk.get("column") or fk.get("from_column")
-                rt = fk.get("ref_table") or fk.get("to_table")
-                rc = fk.get("ref_column") or fk.get("to_column")
-                if c and rt and rc:
-                    fk_bits.append(f"{table_name}.{c} -> {rt}.{rc}")
-            if fk_bits:
-                out.append("  FKS: " + "; ".join(fk_bits))
+            fk_bits = [
+                f"{table_name}.{fk['column']} -> {fk['ref_table']}.{fk['ref_column']}"
+                for fk in fks[:30]
+            ]
+            out.append("  FKS: " + "; ".join(fk_bits))
 
         out.append("")
 
@@ -162,14 +355,19 @@ def schema_summary(schema_json: dict) -> str:
 # ---------------------------------------------------------
 # Extract pure SQL from model output (SQL-only gate)
 # ---------------------------------------------------------
+_FENCE_OPEN_RE = re.compile(r"^```(?:sql)?\s*", re.IGNORECASE)
+_FENCE_CLOSE_RE = re.compile(r"\s*```$")
+_SQL_LABEL_RE = re.compile(r"^\s*sql\s*:\s*", re.IGNORECASE)
+_SELECT_OR_WITH_RE = re.compile(r"^(select|with)\b", re.IGNORECASE)
+
 def extract_sql(text: str) -> str:
     if not text:
         return ""
 
     t = text.strip()
-    t = re.sub(r"^```(?:sql)?\s*", "", t, flags=re.IGNORECASE)
-    t = re.sub(r"\s*```$", "", t)
-    t = re.sub(r"^\s*sql\s*:\s*", "", t, flags=re.IGNORECASE)
+    t = _FENCE_OPEN_RE.sub("", t)
+    t = _FENCE_CLOSE_RE.sub("", t)
+    t = _SQL_LABEL_RE.sub("", t)
 
     parts = [p.strip() for p in t.split(";") if p.strip()]
     if not parts:
@@ -178,7 +376,7 @@ def extract_sql(text: str) -> str:
     sql = parts[0] + ";"
 
     # must start with SELECT or WITH
-    if not re.match(r"^(select|with)\b", sql.strip(), re.IGNORECASE):
+    if not _SELECT_OR_WITH_RE.match(sql.strip()):
         return ""
 
     return sql
@@ -187,22 +385,30 @@ def extract_sql(text: str) -> str:
 # ---------------------------------------------------------
 # Product boundary enforcement: reject disallowed SQL
 # ---------------------------------------------------------
+_DISALLOWED_RE = re.compile(r"^\s*(?:create|drop|alter|truncate|grant|revoke)\b", re.IGNORECASE)
+
 def reject_disallowed_sql(sql: str):
-    s = (sql or "").strip().lower()
-    disallowed = ("create ", "drop ", "alter ", "truncate ", "grant ", "revoke ")
-    if s.startswith(disallowed):
+    s = sql or ""
+    if _DISALLOWED_RE.match(s):
         raise ValueError("DDL / privileged statements are not supported.")
     # also block multiple statements defensively (extract_sql already takes first)
-    if ";" in (sql or "").strip()[:-1]:
+    # (any ';' before the final non-whitespace character)
+    if s.find(";", 0, max(len(s.rstrip()) - 1, 0)) != -1:
         raise ValueError("Multi-statement SQL is not supported.")
 
 
 # ---------------------------------------------------------
 # Phase 4A–C: primary AI SQL generator
 # ---------------------------------------------------------
-def ai_generate_sql(schema_json: dict, question: str) -> str:
-    schema_text = schema_summary(schema_json)
-
+# Sampling temperature when several candidates are requested at once
+CANDIDATE_TEMPERATURE = 0.4
+
+async def ai_generate_sql(schema_text: str, question: str, n: int = 2) -> list[str]:
+    """
+    Ask for n candidates in one request (prompt tokens are billed once) so
+    /generate can pick one that already validates instead of paying for a fix
+    round-trip. Returns the distinct candidates that pass the SQL-only gate.
+    """
     system = (
         "You are a highly accurate senior PostgreSQL engineer.\n"
         "Rules:\n"
@@ -219,32 +425,43 @@ def ai_generate_sql(schema_json: dict, question: str) -> str:
         "Return one valid PostgreSQL query. SQL only."
     )
 
-    resp = call_openai_with_retry(lambda: client.chat.completions.create(
+    resp = await call_openai_with_retry(lambda: client.chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
-        temperature=0.0,
+        # n identical greedy samples would just be deduplicated away
+        temperature=0.0 if n == 1 else CANDIDATE_TEMPERATURE,
         max_tokens=300,
+        n=n,
     ))
 
-    raw = resp.choices[0].message.content
-    sql = extract_sql(raw)
-
-    if not sql:
-        raise ValueError("Model did not return valid SQL.")
+    candidates: list[str] = []
+    last_err: Exception = ValueError("Model did not return valid SQL.")
+    for choice in resp.choices:
+        sql = extract_sql(choice.message.content)
+        if not sql:
+            continue
+        try:
+            reject_disallowed_sql(sql)
+        except ValueError as e:
+            last_err = e
+            continue
+        if sql not in candidates:
+            candidates.append(sql)
 
-    reject_disallowed_sql(sql)
-    return sql
+    if not candidates:
+        raise last_err
+    return candidates
 
 
 # ---------------------------------------------------------
 # Phase 4E: AI auto-fix using validation feedback
 # ---------------------------------------------------------
-def ai_fix_sql(schema_json: dict, question: str, bad_sql: str, validation: dict) -> str:
-    schema_text = schema_summary(schema_json)
-
+async def ai_fix_sql(
+    schema_text: str, question: str, bad_sql: str, validation: dict, temperature: float = 0.0
+) -> str:
     system = (
         "You are a senior PostgreSQL engineer fixing an existing query.\n"
         "Rules:\n"
@@ -263,13 +480,13 @@ def ai_fix_sql(schema_json: dict, question: str, bad_sql: str, validation: dict)
         "Return a corrected SQL query."
     )
 
-    resp = call_openai_with_retry(lambda: client.chat.completions.create(
+    resp = await call_openai_with_retry(lambda: client.chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
-        temperature=0.0,
+        temperature=temperature,
         max_tokens=300,
     ))
 
@@ -283,6 +500,53 @@ def ai_fix_sql(schema_json: dict, question: str, bad_sql: str, validation: dict)
     return sql
 
 
+# Two fix variants race each other; the deterministic one is listed first
+FIX_TEMPERATURES = (0.0, 0.3)
+
+async def speculative_fix(
+    schema_text: str, question: str, bad_sql: str, validation: dict, schema_json: dict
+) -> tuple[str, dict]:
+    """
+    Run the fix variants concurrently and return (sql, validation) for the first
+    one that is no longer an AI issue. If none is, return the variant listed first
+    in FIX_TEMPERATURES (or whichever one succeeded). Raises the first error only
+    if every variant failed.
+    """
+    tasks = [
+        asyncio.create_task(ai_fix_sql(schema_text, question, bad_sql, validation, temperature=t))
+        for t in FIX_TEMPERATURES
+    ]
+    results: dict[int, tuple[str, dict]] = {}
+    first_err = None
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # check in FIX_TEMPERATURES order so a tie goes to the deterministic variant
+            for i, task in enumerate(tasks):
+                if task not in done:
+                    continue
+                try:
+                    sql = task.result()
+                except Exception as e:
+                    first_err = first_err or e
+                    continue
+                fixed_validation = validate_against_schema(sql, schema_json)
+                if not needs_fix(fixed_validation, question, schema_json):
+                    return sql, fixed_validation
+                results[i] = (sql, fixed_validation)
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+            elif not t.cancelled():
+                t.exception()  # mark a losing variant's error as retrieved
+
+    if not results:
+        raise first_err
+    return results[min(results)]
+
+
 # ---------------------------------------------------------
 # Heuristic fallback (Phase 2 last resort)
 # ---------------------------------------------------------
@@ -321,6 +585,18 @@ def smart_sql_generator(schema_json: dict, question: str) -> str:
     return f"SELECT {col_list} FROM {first_table} LIMIT 50;"
 
 
+# ---------------------------------------------------------
+# Validation findings that warrant an AI fix attempt
+# ---------------------------------------------------------
+def needs_fix(validation: dict, question: str, schema_json: dict) -> bool:
+    """
+    Stop rule for candidate selection and speculative_fix: only an ai_issue is
+    worth another model call. unknown_identifiers alone is not a signal (it also
+    lists qualified columns and output aliases of perfectly valid SQL).
+    """
+    return classify_issue(validation, question, schema_json).get("class", "ai_issue") == "ai_issue"
+
+
 # ---------------------------------------------------------
 # UX message helper (Phase 6 UX-level errors)
 # ---------------------------------------------------------
@@ -354,32 +630,9 @@ class ValidateRequest(BaseModel):
 
 
 # ---------------------------------------------------------
-# Schema endpoints
+# Schema upload helpers (raise HTTPException on rejection)
 # ---------------------------------------------------------
-@app.post("/schema")
-async def upload_schema(request: Request, response: Response, file: UploadFile = File(...)):
-    cid = get_or_set_client_id(request, response)
-    bucket = get_usage_bucket(cid)
-    response.headers["X-RateLimit-Limit-Schemas"] = str(MAX_SCHEMAS_PER_DAY)
-    response.headers["X-RateLimit-Remaining-Schemas"] = str(MAX_SCHEMAS_PER_DAY - bucket["schemas"])
-    require_limit(bucket, "schemas", MAX_SCHEMAS_PER_DAY, "schema uploads")
-
-    raw = await file.read()
-        
-    if file.filename and not file.filename.lower().endswith(".sql"):
-        raise HTTPException(
-            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            detail="Please upload a .sql file (schema.sql)."
-        )
-
-
-    # 1) Reject upload if file is too large (bytes check)
-    if len(raw) > MAX_UPLOAD_BYTES:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"Schema file too large. Max allowed is {MAX_UPLOAD_MB} MB."
-        )
-
+def parse_uploaded_schema(raw: bytes) -> dict:
     # Decode text
     text = raw.decode("utf-8", errors="ignore").strip()
     if not text:
@@ -388,24 +641,26 @@ async def upload_schema(request: Request, response: Response, file: UploadFile =
             detail="Empty schema file. Please upload a schema.sql with CREATE TABLE statements."
         )
 
-    # 2) Parse schema safely (do NOT persist unless this succeeds)
     try:
         tables = parse_schema_sql(text)
-        schema_json = to_schema_json(tables)
+        schema_json = normalize_schema(to_schema_json(tables))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"Failed to parse schema.sql: {type(e).__name__}: {str(e)}"
         )
 
-    all_tables = schema_json.get("tables", {}) or {}
-    if not all_tables:
+    if not schema_json["tables"]:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="No tables parsed. Ensure schema.sql includes valid CREATE TABLE statements."
         )
 
-    # 3) Reject schema if too big (tables / total columns / columns-per-table)
+    return schema_json
+
+
+def check_schema_limits(all_tables: dict) -> tuple[int, int]:
+    """Enforce table / total column / per-table column limits; returns (tables, columns)."""
     table_count = len(all_tables)
     if table_count > MAX_TABLES:
         raise HTTPException(
@@ -415,8 +670,7 @@ async def upload_schema(request: Request, response: Response, file: UploadFile =
 
     total_cols = 0
     for tname, tmeta in all_tables.items():
-        cols = (tmeta.get("columns", {}) or {})
-        col_count = len(cols)
+        col_count = len(tmeta["columns"])
         total_cols += col_count
 
         if col_count > MAX_COLUMNS_PER_TABLE:
@@ -431,20 +685,84 @@ async def upload_schema(request: Request, response: Response, file: UploadFile =
                 detail=f"Schema has too many total columns ({total_cols}). Max allowed is {MAX_TOTAL_COLUMNS}."
             )
 
-    # 4) Persist ONLY after all checks pass (atomic write)
-    schema_id = str(uuid.uuid4())
-    SCHEMAS[schema_id] = schema_json
+    return table_count, total_cols
 
-    out_path = SCHEMA_DIR / f"{schema_id}.json"
-    tmp_path = SCHEMA_DIR / f"{schema_id}.json.tmp"
-    tmp_path.write_text(json.dumps(schema_json, ensure_ascii=False), encoding="utf-8")
-    tmp_path.replace(out_path)
 
-    # increment ONLY after success
-    bucket["schemas"] += 1
-    response.headers["X-RateLimit-Remaining-Schemas"] = str(MAX_SCHEMAS_PER_DAY - bucket["schemas"])
+# ---------------------------------------------------------
+# Schema endpoints
+# ---------------------------------------------------------
+@app.post("/schema")
+async def upload_schema(request: Request, response: Response, file: UploadFile = File(...)):
+    cid = get_or_set_client_id(request, response)
 
-    request_id = str(uuid.uuid4())
+    if file.filename and not file.filename.lower().endswith(".sql"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Please upload a .sql file (schema.sql)."
+        )
+
+    # reserve the slot before the first await; refunded if the upload is rejected
+    used = await reserve_usage(cid, "schemas", MAX_SCHEMAS_PER_DAY, "schema uploads")
+    response.headers["X-RateLimit-Limit-Schemas"] = str(MAX_SCHEMAS_PER_DAY)
+    response.headers["X-RateLimit-Remaining-Schemas"] = str(MAX_SCHEMAS_PER_DAY - used)
+
+    try:
+        # 1) Read in chunks and reject as soon as the upload exceeds the limit,
+        #    so memory stays bounded whatever the client actually sends
+        buf = bytearray()
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            if len(buf) + len(chunk) > MAX_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Schema file too large. Max allowed is {MAX_UPLOAD_MB} MB."
+                )
+            buf.extend(chunk)
+        raw = bytes(buf)
+
+        # 2) Parse schema safely (do NOT persist unless this succeeds).
+        #    An identical earlier upload's parse is reused, keyed by content digest.
+        digest = hashlib.sha256(raw).hexdigest()
+        cache_path = PARSE_CACHE_DIR / f"v{PARSE_CACHE_VERSION}-{digest}.json"
+        try:
+            schema_json = orjson.loads(cache_path.read_bytes())
+            os.utime(cache_path)  # recently used entries survive prune_parse_cache()
+            cache_hit = True
+        except FileNotFoundError:
+            schema_json = parse_uploaded_schema(raw)
+            cache_hit = False
+
+        # 3) Reject schema if too big (cheap, so also re-checked on cache hits)
+        all_tables = schema_json["tables"]
+        table_count, total_cols = check_schema_limits(all_tables)
+
+        if not cache_hit:
+            # unique temp name: concurrent workers may write the same digest
+            tmp_cache = cache_path.with_name(f"{cache_path.name}.{secrets.token_hex(8)}.tmp")
+            tmp_cache.write_bytes(orjson.dumps(schema_json))
+            tmp_cache.replace(cache_path)
+            prune_parse_cache()
+
+        # 4) Persist ONLY after all checks pass (atomic write)
+        schema_id = secrets.token_hex(16)
+        lru_put(SCHEMAS, schema_id, schema_json)
+        lru_put(SCHEMA_SUMMARIES, schema_id, schema_summary(schema_json))
+
+        out_path = SCHEMA_DIR / f"{schema_id}.json"
+        tmp_path = SCHEMA_DIR / f"{schema_id}.json.tmp"
+        schema_bytes = orjson.dumps(schema_json)
+        tmp_path.write_bytes(schema_bytes)
+        tmp_path.replace(out_path)
+        if rds is not None:
+            await rds.set(schema_cache_key(schema_id), schema_bytes, ex=SCHEMA_TTL_SECONDS)
+    except Exception:
+        # only successful uploads count
+        await release_usage(cid, "schemas")
+        raise
+
+    request_id = secrets.token_hex(16)
     return {
         "status": "ok",
         "request_id": request_id,
@@ -457,23 +775,18 @@ async def upload_schema(request: Request, response: Response, file: UploadFile =
 @app.get("/schema/{schema_id}")
 async def get_schema(schema_id: str, request: Request, response: Response):
     cid = get_or_set_client_id(request, response)
-    _ = get_usage_bucket(cid)  # ensure client_id exists, even if not rate-limited here
-    request_id = str(uuid.uuid4())
+    _ = await get_usage_bucket(cid)  # ensure client_id exists, even if not rate-limited here
+    request_id = secrets.token_hex(16)
 
-    schema_json = SCHEMAS.get(schema_id)
+    schema_json = await load_schema(schema_id)
     if not schema_json:
-        p = SCHEMA_DIR / f"{schema_id}.json"
-        if p.exists():
-            schema_json = json.loads(p.read_text(encoding="utf-8"))
-            SCHEMAS[schema_id] = schema_json
-        else:
-            return {
-                "status": "error",
-                "request_id": request_id,
-                "classification": {"class": "schema_issue"},
-                "message": "Unknown schema_id. Please upload schema.sql again.",
-                "error": "unknown_schema_id",
-            }
+        return {
+            "status": "error",
+            "request_id": request_id,
+            "classification": {"class": "schema_issue"},
+            "message": "Unknown schema_id. Please upload schema.sql again.",
+            "error": "unknown_schema_id",
+        }
 
     return {
         "status": "ok",
@@ -488,13 +801,9 @@ async def get_schema(schema_id: str, request: Request, response: Response):
 # + Phase 6: question length + usage limit + UX message
 # ---------------------------------------------------------
 @app.post("/generate")
-async def generate(request: Request, response: Response, req: GenerateRequest):
+async def generate(request: Request, response: Response, req: GenerateRequest, background_tasks: BackgroundTasks):
     cid = get_or_set_client_id(request, response)
-    bucket = get_usage_bucket(cid)
-    response.headers["X-RateLimit-Limit-Generates"] = str(MAX_GENERATES_PER_DAY)
-    response.headers["X-RateLimit-Remaining-Generates"] = str(MAX_GENERATES_PER_DAY - bucket["generates"])
-    require_limit(bucket, "generates", MAX_GENERATES_PER_DAY, "query generations")
-    request_id = str(uuid.uuid4())
+    request_id = secrets.token_hex(16)
 
     q = (req.question or "").strip()
     if not q:
@@ -505,14 +814,17 @@ async def generate(request: Request, response: Response, req: GenerateRequest):
             detail=f"Question too long. Max is {MAX_QUESTION_CHARS} characters."
         )
 
-    schema_json = SCHEMAS.get(req.schema_id)
+    # reserve the slot before the first await; refunded if no answer is produced
+    used = await reserve_usage(cid, "generates", MAX_GENERATES_PER_DAY, "query generations")
+    response.headers["X-RateLimit-Limit-Generates"] = str(MAX_GENERATES_PER_DAY)
+    response.headers["X-RateLimit-Remaining-Generates"] = str(MAX_GENERATES_PER_DAY - used)
 
-    if not schema_json:
-        p = SCHEMA_DIR / f"{req.schema_id}.json"
-        if p.exists():
-            schema_json = json.loads(p.read_text(encoding="utf-8"))
-            SCHEMAS[req.schema_id] = schema_json
-        else:
+    try:
+        schema_json = await load_schema(req.schema_id)
+        if not schema_json:
+            # refunding does not gate anything, so it can run after the response
+            background_tasks.add_task(release_usage, cid, "generates")
+            response.headers["X-RateLimit-Remaining-Generates"] = str(MAX_GENERATES_PER_DAY - used + 1)
             return {
                 "status": "error",
                 "request_id": request_id,
@@ -521,19 +833,55 @@ async def generate(request: Request, response: Response, req: GenerateRequest):
                 "error": "unknown_schema_id",
             }
 
-    # 1) Initial AI generation
-    try:
-        sql = ai_generate_sql(schema_json, q)
-    except RateLimitError as e:
-        # AI unreachable → heuristics allowed
-        sql = smart_sql_generator(schema_json, q)
+        schema_text = lru_get(SCHEMA_SUMMARIES, req.schema_id)
+        if schema_text is None:
+            schema_text = schema_summary(schema_json)
+            lru_put(SCHEMA_SUMMARIES, req.schema_id, schema_text)
+
+        # 1) Initial AI generation
+        try:
+            candidates = await ai_generate_sql(schema_text, q)
+        except RateLimitError as e:
+            # AI unreachable → heuristics allowed
+            sql = smart_sql_generator(schema_json, q)
+            validation = validate_against_schema(sql, schema_json)
+            classification = classify_issue(validation, q, schema_json)
+
+            return {
+                "status": "ok",
+                "request_id": request_id,
+                "sql": sql,
+                "validation": validation,
+                "classification": classification,
+                "message": ux_message(classification, validation),
+                "note": f"AI unreachable; fallback used. Error: {type(e).__name__}: {str(e)}",
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "request_id": request_id,
+                "sql": None,
+                "validation": None,
+                "classification": {"class": "ai_issue"},
+                "message": "AI returned invalid output. Try again or simplify your question.",
+                "error": f"AI returned invalid output: {type(e).__name__}: {str(e)}",
+            }
+
+        # 2) Validate candidates; take the first one that is not an AI issue, else fix the first
+        sql = candidates[0]
         validation = validate_against_schema(sql, schema_json)
+        for alt in candidates[1:]:
+            if not needs_fix(validation, q, schema_json):
+                break
+            alt_validation = validate_against_schema(alt, schema_json)
+            if not needs_fix(alt_validation, q, schema_json):
+                sql, validation = alt, alt_validation
+
+        # 3) Auto-fix (AI issue only): fix variants run concurrently, first clean one wins
+        if needs_fix(validation, q, schema_json):
+            sql, validation = await speculative_fix(schema_text, q, sql, validation, schema_json)
         classification = classify_issue(validation, q, schema_json)
 
-        # increment usage for a successful response (even if fallback)
-        bucket["generates"] += 1
-        response.headers["X-RateLimit-Remaining-Generates"] = str(MAX_GENERATES_PER_DAY - bucket["generates"])
-
         return {
             "status": "ok",
             "request_id": request_id,
@@ -541,60 +889,12 @@ async def generate(request: Request, response: Response, req: GenerateRequest):
             "validation": validation,
             "classification": classification,
             "message": ux_message(classification, validation),
-            "note": f"AI unreachable; fallback used. Error: {type(e).__name__}: {str(e)}",
         }
-    except Exception as e:
-        bucket["generates"] += 1
-        response.headers["X-RateLimit-Remaining-Generates"] = str(MAX_GENERATES_PER_DAY - bucket["generates"])
-
-        return {
-            "status": "error",
-            "request_id": request_id,
-            "sql": None,
-            "validation": None,
-            "classification": {"class": "ai_issue"},
-            "message": "AI returned invalid output. Try again or simplify your question.",
-            "error": f"AI returned invalid output: {type(e).__name__}: {str(e)}",
-        }
-
-    # 2) Validate first candidate
-    validation = validate_against_schema(sql, schema_json)
-    classification = classify_issue(validation, q, schema_json)
-    issue_class = classification.get("class", "ai_issue")
-
-    # 3) Auto-fix loop (AI issue only, max 2 retries)
-    for _ in range(2):
-        if issue_class != "ai_issue":
-            break
-
-        needs_fix = (
-            bool(validation.get("missing_tables")) or
-            bool(validation.get("unknown_columns")) or
-            bool(validation.get("unknown_aliases")) or
-            bool(validation.get("unknown_identifiers")) or
-            bool(validation.get("invalid_joins")) or
-            bool(validation.get("type_mismatches"))
-        )
-        if not needs_fix:
-            break
-
-        sql = ai_fix_sql(schema_json, q, sql, validation)
-        validation = validate_against_schema(sql, schema_json)
-        classification = classify_issue(validation, q, schema_json)
-        issue_class = classification.get("class", "ai_issue")
-
-    # increment usage on successful response
-    bucket["generates"] += 1
-    response.headers["X-RateLimit-Remaining-Generates"] = str(MAX_GENERATES_PER_DAY - bucket["generates"])
-
-    return {
-        "status": "ok",
-        "request_id": request_id,
-        "sql": sql,
-        "validation": validation,
-        "classification": classification,
-        "message": ux_message(classification, validation),
-    }
+    except Exception:
+        # the slot counts for any answer, fallback and AI-error responses included.
+        # Refunded inline: background tasks do not run when the handler raises.
+        await release_usage(cid, "generates")
+        raise
 
 
 # ---------------------------------------------------------
@@ -603,30 +903,24 @@ async def generate(request: Request, response: Response, req: GenerateRequest):
 @app.post("/validate")
 async def validate(request: Request, response: Response, req: ValidateRequest):
     cid = get_or_set_client_id(request, response)
-    _ = get_usage_bucket(cid)
-    request_id = str(uuid.uuid4())
+    _ = await get_usage_bucket(cid)
+    request_id = secrets.token_hex(16)
     
     # Add generate limits for UI consistency
     response.headers["X-RateLimit-Limit-Generates"] = str(MAX_GENERATES_PER_DAY)
-    bucket = get_usage_bucket(cid)
+    bucket = await get_usage_bucket(cid)
     response.headers["X-RateLimit-Remaining-Generates"] = str(MAX_GENERATES_PER_DAY - bucket["generates"])
 
 
-    schema_json = SCHEMAS.get(req.schema_id)
-
+    schema_json = await load_schema(req.schema_id)
     if not schema_json:
-        p = SCHEMA_DIR / f"{req.schema_id}.json"
-        if p.exists():
-            schema_json = json.loads(p.read_text(encoding="utf-8"))
-            SCHEMAS[req.schema_id] = schema_json
-        else:
-            return {
-                "status": "error",
-                "request_id": request_id,
-                "classification": {"class": "schema_issue"},
-                "message": "Unknown schema_id. Please upload schema.sql again.",
-                "error": "unknown_schema_id",
-            }
+        return {
+            "status": "error",
+            "request_id": request_id,
+            "classification": {"class": "schema_issue"},
+            "message": "Unknown schema_id. Please upload schema.sql again.",
+            "error": "unknown_schema_id",
+        }
 
     return {
         "status": "ok",
@@ -639,7 +933,7 @@ async def validate(request: Request, response: Response, req: ValidateRequest):
 @app.get("/_debug/usage")
 async def debug_usage(request: Request, response: Response):
     cid = get_or_set_client_id(request, response)
-    bucket = get_usage_bucket(cid)
+    bucket = await get_usage_bucket(cid)
     tk = today_key()
 
     return {
@@ -4,14 +4,14 @@ from dataclasses import dataclass
 from typing import Dict, List
 
 
-@dataclass
+@dataclass(slots=True)
 class ForeignKey:
     column: str
     ref_table: str
     ref_column: str
 
 
-@dataclass
+@dataclass(slots=True)
 class TableMeta:
     name: str
     columns: Dict[str, str]
@@ -36,6 +36,22 @@ FK_RE = re.compile(
     re.IGNORECASE,
 )
 
+# Column-definition tails, used per column inside parse_schema_sql
+_TYPE_TERMINATOR_RE = re.compile(
+    r"\s+(?:NOT\s+NULL|NULL|DEFAULT|PRIMARY\s+KEY|UNIQUE|REFERENCES)\b",
+    re.IGNORECASE,
+)
+
+_INLINE_PK_RE = re.compile(r"\bPRIMARY\s+KEY\b", re.IGNORECASE)
+
+_INLINE_REF_RE = re.compile(
+    r"\bREFERENCES\s+(?P<ref_table>(?:\"[^\"]+\"|\w+)(?:\.(?:\"[^\"]+\"|\w+))?)\s*\((?P<ref_col>[^)]+)\)",
+    re.IGNORECASE,
+)
+
+# Characters that affect top-level comma splitting
+_SPLIT_EVENT_RE = re.compile(r"['(),]")
+
 
 def _clean_ident(s: str) -> str:
     s = s.strip()
@@ -45,100 +61,105 @@ def _clean_ident(s: str) -> str:
 
 
 def _split_top_level_commas(body: str) -> List[str]:
-    parts, buf = [], []
+    # Only quotes, parens and commas change state, so let the regex engine
+    # find them and skip over everything else in C.
+    parts = []
     depth = 0
     in_str = False
-
-    for i, ch in enumerate(body):
-        if ch == "'" and (i == 0 or body[i - 1] != "\\"):
-            in_str = not in_str
-            buf.append(ch)
+    last = 0
+
+    for m in _SPLIT_EVENT_RE.finditer(body):
+        ch = m.group()
+        i = m.start()
+        if ch == "'":
+            if i == 0 or body[i - 1] != "\\":
+                in_str = not in_str
         elif not in_str:
             if ch == "(":
                 depth += 1
-                buf.append(ch)
             elif ch == ")":
                 depth = max(0, depth - 1)
-                buf.append(ch)
-            elif ch == "," and depth == 0:
-                parts.append("".join(buf).strip())
-                buf = []
-            else:
-                buf.append(ch)
-        else:
-            buf.append(ch)
-
-    tail = "".join(buf).strip()
+            elif depth == 0:
+                parts.append(body[last:i].strip())
+                last = i + 1
+
+    tail = body[last:].strip()
     if tail:
         parts.append(tail)
 
     return parts
 
 
-def parse_schema_sql(schema_sql: str) -> Dict[str, TableMeta]:
-    tables: Dict[str, TableMeta] = {}
+# Optional compiled version (see _schema_split.pyx); pure Python above otherwise
+try:
+    from _schema_split import split_top_level_commas as _split_top_level_commas
+except ImportError:
+    pass
 
-    for m in CREATE_TABLE_RE.finditer(schema_sql):
-        raw_name = m.group("name")
-        body = m.group("body")
 
-        name = _clean_ident(raw_name.split(".")[-1])
+def _parse_one_table(raw_name: str, body: str) -> TableMeta:
+    name = _clean_ident(raw_name.split(".")[-1])
 
-        columns = {}
-        primary_key = []
-        foreign_keys = []
+    columns = {}
+    primary_key = []
+    foreign_keys = []
+
+    items = _split_top_level_commas(body)
+
+    for item in items:
+        item_stripped = item.strip()
+        # Most items are plain column defs; cheap substring gates skip the
+        # constraint regexes for them. (Gates use one word so "PRIMARY\n KEY"
+        # still reaches the regex.)
+        up = item_stripped.upper()
+        has_primary = "PRIMARY" in up
+        has_references = "REFERENCES" in up
+
+        pk_match = PK_RE.search(item_stripped) if has_primary else None
+        if pk_match:
+            cols = [_clean_ident(c) for c in pk_match.group("cols").split(",")]
+            primary_key.extend([c for c in cols if c])
+            continue
 
-        items = _split_top_level_commas(body)
+        fk_match = FK_RE.search(item_stripped) if has_references else None
+        if fk_match:
+            col = _clean_ident(fk_match.group("col").split(",")[0])
+            ref_table = _clean_ident(fk_match.group("ref_table").split(".")[-1])
+            ref_col = _clean_ident(fk_match.group("ref_col").split(",")[0])
+            foreign_keys.append(ForeignKey(col, ref_table, ref_col))
+            continue
 
-        for item in items:
-            item_stripped = item.strip()
+        col_match = COLUMN_DEF_RE.match(item_stripped)
+        if col_match:
+            col = _clean_ident(col_match.group("col"))
+            col_type = col_match.group("type").strip()
 
-            pk_match = PK_RE.search(item_stripped)
-            if pk_match:
-                cols = [_clean_ident(c) for c in pk_match.group("cols").split(",")]
-                primary_key.extend([c for c in cols if c])
-                continue
+            col_type = _TYPE_TERMINATOR_RE.split(col_type)[0].strip()
 
-            fk_match = FK_RE.search(item_stripped)
-            if fk_match:
-                col = _clean_ident(fk_match.group("col").split(",")[0])
-                ref_table = _clean_ident(fk_match.group("ref_table").split(".")[-1])
-                ref_col = _clean_ident(fk_match.group("ref_col").split(",")[0])
+            columns[col] = col_type
+
+            if has_primary and _INLINE_PK_RE.search(item_stripped):
+                primary_key.append(col)
+
+            inline_ref = _INLINE_REF_RE.search(item_stripped) if has_references else None
+            if inline_ref:
+                ref_table = _clean_ident(inline_ref.group("ref_table").split(".")[-1])
+                ref_col = _clean_ident(inline_ref.group("ref_col").split(",")[0])
                 foreign_keys.append(ForeignKey(col, ref_table, ref_col))
-                continue
-
-            col_match = COLUMN_DEF_RE.match(item_stripped)
-            if col_match:
-                col = _clean_ident(col_match.group("col"))
-                col_type = col_match.group("type").strip()
-
-                col_type = re.split(
-                    r"\s+(?:NOT\s+NULL|NULL|DEFAULT|PRIMARY\s+KEY|UNIQUE|REFERENCES)\b",
-                    col_type,
-                    flags=re.IGNORECASE,
-                )[0].strip()
-
-                columns[col] = col_type
-
-                if re.search(r"\bPRIMARY\s+KEY\b", item_stripped, re.IGNORECASE):
-                    primary_key.append(col)
-
-                inline_ref = re.search(
-                    r"\bREFERENCES\s+(?P<ref_table>(?:\"[^\"]+\"|\w+)(?:\.(?:\"[^\"]+\"|\w+))?)\s*\((?P<ref_col>[^)]+)\)",
-                    item_stripped,
-                    re.IGNORECASE,
-                )
-                if inline_ref:
-                    ref_table = _clean_ident(inline_ref.group("ref_table").split(".")[-1])
-                    ref_col = _clean_ident(inline_ref.group("ref_col").split(",")[0])
-                    foreign_keys.append(ForeignKey(col, ref_table, ref_col))
-
-        tables[name] = TableMeta(
-            name=name,
-            columns=columns,
-            primary_key=list(dict.fromkeys(primary_key)),
-            foreign_keys=foreign_keys,
-        )
+
+    return TableMeta(
+        name=name,
+        columns=columns,
+        primary_key=list(dict.fromkeys(primary_key)),
+        foreign_keys=foreign_keys,
+    )
+
+
+def parse_schema_sql(schema_sql: str) -> Dict[str, TableMeta]:
+    tables: Dict[str, TableMeta] = {}
+    for m in CREATE_TABLE_RE.finditer(schema_sql):
+        tmeta = _parse_one_table(m.group("name"), m.group("body"))
+        tables[tmeta.name] = tmeta
 
     return tables
 
@@ -160,4 +181,43 @@ def to_schema_json(tables: Dict[str, TableMeta]) -> dict:
             }
             for tname, tmeta in tables.items()
         }
-    }
\ No newline at end of file
+    }
+
+
+def normalize_schema(schema_json: dict) -> dict:
+    """
+    Canonical schema shape, so readers can use one key per field:
+      columns      -> {name: type_str}
+      foreign_keys -> [{"column", "ref_table", "ref_column"}]
+    Also accepts older shapes (column dicts with "type"/"data_type",
+    FKs keyed from_column/to_table/to_column). Incomplete FKs are dropped.
+    """
+    tables = {}
+
+    for tname, meta in ((schema_json or {}).get("tables") or {}).items():
+        meta = meta or {}
+
+        columns = {}
+        for col, col_meta in (meta.get("columns") or {}).items():
+            if isinstance(col_meta, dict):
+                col_meta = col_meta.get("type") or col_meta.get("data_type") or "UNKNOWN"
+            columns[col] = str(col_meta)
+
+        foreign_keys = []
+        for fk in meta.get("foreign_keys") or []:
+            c = fk.get("column") or fk.get("from_column")
+            rt = fk.get("ref_table") or fk.get("to_table")
+            rc = fk.get("ref_column") or fk.get("to_column")
+            if c and rt and rc:
+                foreign_keys.append({"column": c, "ref_table": rt, "ref_column": rc})
+
+        table = {
+            "columns": columns,
+            "primary_key": list(meta.get("primary_key") or []),
+            "foreign_keys": foreign_keys,
+        }
+        if meta.get("not_null"):
+            table["not_null"] = list(meta["not_null"])
+        tables[tname] = table
+
+    return {"tables": tables}
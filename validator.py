@@ -1,70 +1,85 @@
 from __future__ import annotations
 
+import os
 import re
-from typing import Dict, List, Any, Optional
+import sys
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterator, List, Any, Optional, Set, Tuple, Union
 
 
 # -------------------------
 # Regex patterns (MVP-safe)
 # -------------------------
-
-# FROM/JOIN table alias detection:
-#   FROM employees e
-#   FROM employees AS e
-#   JOIN branches b
-#   JOIN branches AS b
-FROM_JOIN_RE = re.compile(
-    r"\b(from|join)\s+([A-Za-z_][A-Za-z0-9_]*)\s+(?:as\s+)?([A-Za-z_][A-Za-z0-9_]*)\b",
-    re.IGNORECASE,
+# ALL REGEXES DEFINED AT MODULE LEVEL: functions only call methods on these
+# compiled patterns, never re.search/re.sub/re.compile with a built string.
+
+# One named alternation lexes the whole SQL; _scan() dispatches on
+# m.lastgroup and recognises these shapes from the token stream:
+#   FROM/JOIN table [AS] alias      FROM employees AS e
+#   qualified column                e.emp_id
+#   alias.col OP literal            e.salary > 10   ('text', 123, 12.3, null, true/false)
+#   alias.col LIKE '...'            b.branch_name LIKE 'x%'
+#   JOIN ON equality                ON e.branch_id = b.branch_id
+#   unqualified identifiers         emp_id
+# Tokens never split a \w run, so "ident" is always a whole ASCII word.
+# Quotes are single tokens rather than whole strings: a '...' literal is
+# just the span between two quote tokens, and words inside it still count.
+TOKEN_RE = re.compile(
+    r"(?P<ident>[A-Za-z_][A-Za-z0-9_]*(?!\w))"
+    r"|(?P<word>\w+)"
+    r"|(?P<ws>\s+)"
+    r"|(?P<quote>')"
+    r"|(?P<op>>=|<=|<>|!=|=|>|<)"
+    r"|(?P<dot>\.)"
+    r"|(?P<other>.)",
+    re.S,
 )
 
-# Qualified column reference: e.emp_id
-QUAL_COL_RE = re.compile(r"\b([A-Za-z_][A-Za-z0-9_]*)\.([A-Za-z_][A-Za-z0-9_]*)\b")
-
-# Phase 3C: alias.col OP literal  (simple literal support: 'text', 123, 12.3, null, true/false)
-QUAL_COMP_LIT_RE = re.compile(
-    r"\b(?P<a>[A-Za-z_][A-Za-z0-9_]*)\.(?P<c>[A-Za-z_][A-Za-z0-9_]*)\s*"
-    r"(?P<op>>=|<=|<>|!=|=|>|<)\s*"
-    r"(?P<lit>'[^']*'|\d+(?:\.\d+)?|null|true|false)\b",
-    re.IGNORECASE,
-)
+# Leading ASCII identifier of a word (the ON right-hand column has no \b)
+IDENT_PREFIX_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
 
-# Phase 3C: alias.col LIKE '...'
-QUAL_LIKE_RE = re.compile(
-    r"\b(?P<a>[A-Za-z_][A-Za-z0-9_]*)\.(?P<c>[A-Za-z_][A-Za-z0-9_]*)\s+"
-    r"(?P<op>like|ilike)\s+(?P<lit>'[^']*')",
-    re.IGNORECASE,
-)
-
-# JOIN ON equality: ON e.branch_id = b.branch_id
-ON_EQ_RE = re.compile(
-    r"\bon\b\s+(?P<a1>[A-Za-z_][A-Za-z0-9_]*)\.(?P<c1>[A-Za-z_][A-Za-z0-9_]*)\s*=\s*"
-    r"(?P<a2>[A-Za-z_][A-Za-z0-9_]*)\.(?P<c2>[A-Za-z_][A-Za-z0-9_]*)",
-    re.IGNORECASE,
+# Fast path for SQL without any ".": only the FROM/JOIN and identifier
+# shapes can occur, and these two patterns find exactly what the token walk
+# would. Keywords are spelled case-insensitively by hand because
+# re.IGNORECASE would also fold non-ASCII letters such as U+212A KELVIN SIGN.
+FROM_JOIN_RE = re.compile(
+    r"\b(?:[Ff][Rr][Oo][Mm]|[Jj][Oo][Ii][Nn])\s+([A-Za-z_][A-Za-z0-9_]*)\s+"
+    r"(?:[Aa][Ss]\s+)?([A-Za-z_][A-Za-z0-9_]*)\b"
 )
+IDENT_RE = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]*\b")
 
-# Unqualified identifier tokens
-IDENT_RE = re.compile(r"\b([A-Za-z_][A-Za-z0-9_]*)\b")
+# classify_issue: identifier-shaped words in the (lowercased) user question
+QUESTION_WORD_RE = re.compile(r"[a-z_][a-z0-9_]*")
 
-SQL_KEYWORDS = {
+# Frozen and interned: identifiers from _scan() are interned too, so the
+# hot membership tests settle on a pointer compare.
+SQL_KEYWORDS = frozenset(map(sys.intern, {
     "select", "from", "join", "inner", "left", "right", "full", "outer", "cross",
     "on", "where", "group", "by", "order", "having", "limit", "offset", "fetch",
     "union", "all", "distinct", "as", "and", "or", "not", "null", "is", "in", "like",
     "ilike", "between", "case", "when", "then", "else", "end", "asc", "desc", "into",
     "true", "false"
-}
+}))
 
-SQL_FUNCTIONS = {
+SQL_FUNCTIONS = frozenset(map(sys.intern, {
     "count", "sum", "avg", "min", "max", "coalesce", "now", "date_trunc", "lower", "upper"
-}
+}))
 
 
 # -------------------------
 # Helpers
 # -------------------------
 
-def _lower(s: str) -> str:
-    return (s or "").lower()
+def _name(s: Optional[str]) -> str:
+    """
+    Lowercased and interned, so schema names and _scan() tokens are the
+    same objects and dict/set lookups between them short-circuit.
+    """
+    return sys.intern((s or "").lower())
 
 
 def _strip_strings(sql: str) -> str:
@@ -72,40 +87,69 @@ def _strip_strings(sql: str) -> str:
     Remove single-quoted strings to reduce false identifier matches.
     (Not a full SQL lexer, but helps.)
     """
-    return re.sub(r"'.*?(?<!\\)'", "''", sql, flags=re.S)
-
-
-def build_alias_map(sql: str) -> Dict[str, str]:
+    out: List[str] = []
+    find = sql.find
+    i = 0
+    while True:
+        j = find("'", i)
+        if j < 0:
+            break
+        # closing quote = next quote not preceded by a backslash
+        k = find("'", j + 1)
+        while k > 0 and sql[k - 1] == "\\":
+            k = find("'", k + 1)
+        if k < 0:
+            # unterminated: no later quote can close either, keep the rest
+            break
+        out.append(sql[i:j])
+        out.append("''")
+        i = k + 1
+    out.append(sql[i:])
+    return "".join(out)
+
+
+def build_alias_map(sql: Optional[str]) -> Dict[str, str]:
     """
     Returns alias->table mapping (all lowercased)
     """
-    alias_map: Dict[str, str] = {}
-    for m in FROM_JOIN_RE.finditer(sql):
-        table = _lower(m.group(2))
-        alias = _lower(m.group(3))
-        alias_map[alias] = table
-    return alias_map
+    return _scan(sql or "")["alias_map"]
 
 
-def normalize_type(db_type: str) -> str:
+# Coarse type groups in priority order: the first group with a keyword
+# anywhere in the type string wins ("point" -> numeric via "int").
+_TYPE_GROUPS = (
+    ("numeric", ("int", "serial", "numeric", "decimal", "real", "double", "float")),
+    ("text", ("text", "varchar", "char", "uuid")),
+    ("boolean", ("bool",)),
+    ("datetime", ("date", "time", "timestamp", "timestamptz")),
+)
+_TYPE_KEYWORD_RANK = {kw: rank for rank, (_, kws) in enumerate(_TYPE_GROUPS) for kw in kws}
+# Lookahead so overlapping keywords are all seen in one scan
+_TYPE_RE = re.compile(
+    "(?=(" + "|".join(sorted(_TYPE_KEYWORD_RANK, key=len, reverse=True)) + "))"
+)
+
+
+@lru_cache(maxsize=1024)
+def normalize_type(db_type: Optional[str]) -> str:
     """
     Map SQL types into coarse groups: numeric, text, boolean, datetime, other
     """
     t = (db_type or "").lower()
 
-    if any(x in t for x in ["int", "serial", "numeric", "decimal", "real", "double", "float"]):
-        return "numeric"
-
-    if any(x in t for x in ["text", "varchar", "char", "uuid"]):
-        return "text"
+    best = len(_TYPE_GROUPS)
+    for m in _TYPE_RE.finditer(t):
+        rank = _TYPE_KEYWORD_RANK[m.group(1)]
+        if rank < best:
+            best = rank
+            if rank == 0:
+                break
 
-    if "bool" in t:
-        return "boolean"
+    return _TYPE_GROUPS[best][0] if best < len(_TYPE_GROUPS) else "other"
 
-    if any(x in t for x in ["date", "time", "timestamp", "timestamptz"]):
-        return "datetime"
 
-    return "other"
+# Deletes ASCII digits and "."; a numeric literal translates to ""
+_NUMERIC_CHARS = str.maketrans("", "", "0123456789.")
 
 
 def literal_type(lit: str) -> str:
@@ -116,47 +160,302 @@ def literal_type(lit: str) -> str:
         return "boolean"
     if lit.startswith("'") and lit.endswith("'"):
         return "text"
-    return "numeric"
+    if lit and not lit.translate(_NUMERIC_CHARS):
+        return "numeric"
+    return "unknown"
+
+
+def _build_mismatch_table() -> Dict[Tuple[str, str, str], Tuple[str, str]]:
+    """
+    (op, column_type, literal_type) -> (kind, reason) for every comparison
+    that should be reported. Null literals and unlisted combos are fine.
+    """
+    table: Dict[Tuple[str, str, str], Tuple[str, str]] = {}
+    for ct in ("numeric", "text", "boolean", "datetime", "other"):
+        for lt in ("numeric", "text", "boolean", "unknown"):
+            if ct != "numeric":
+                for op in (">", "<", ">=", "<="):
+                    table[(op, ct, lt)] = ("comparison", "Non-numeric column used with numeric comparison operator")
+            if ct in ("numeric", "text", "boolean") and lt != "unknown" and ct != lt:
+                for op in ("=", "!=", "<>"):
+                    table[(op, ct, lt)] = ("equality", "Column type does not match literal type")
+    return table
+
+
+_MISMATCH_TABLE = _build_mismatch_table()
 
 
 # -------------------------
-# Phase 3B: FK-aware JOIN validation
+# Single-pass scan (replaces the per-regex finditer cascade)
 # -------------------------
 
-def fk_join_check(sql: str, schema_json: dict, alias_map: Dict[str, str]) -> dict:
+_Token = Tuple[str, str, str]
+_Quad = Tuple[str, str, str, str]
+
+_END: _Token = ("end", "", "")
+_LIT_WORDS = {"null", "true", "false"}
+_WORD_KINDS = ("ident", "word")
+
+
+def _scan_dotless(sql: str) -> Dict[str, Any]:
     """
-    Validates JOIN ... ON a.col = b.col against schema_json foreign_keys.
-    Returns:
-      invalid_joins: list of join issues
-      join_warnings: list of non-fatal warnings
+    _scan() for SQL with no ".". Qualified refs, comparisons, LIKEs and ON
+    pairs all need "alias.col", so only the alias map and identifiers are
+    collected, each by one C-level regex pass instead of the token walk.
+    """
+    intern = sys.intern
+    return {
+        "alias_map": {
+            intern(alias.lower()): intern(table.lower())
+            for table, alias in FROM_JOIN_RE.findall(sql)
+        },
+        "qualified_refs": [],
+        "qualified_cols": set(),
+        "comparisons": [],
+        "likes": [],
+        "on_pairs": [],
+        "idents": [intern(tok.lower()) for tok in IDENT_RE.findall(sql)],
+    }
+
+
+def _scan(sql: str) -> Dict[str, Any]:
+    """
+    Tokenize once and recognise, in one left-to-right walk, every shape
+    listed above TOKEN_RE. Each shape keeps its own resume index so its
+    matches never overlap each other, while different shapes may share
+    tokens (an ON pair is also two qualified refs).
+
+    Tokens are (kind, text, lowered text); each word is lowercased (and
+    interned) exactly once here, and names come back already lowercased
+    except where the original spelling is echoed into a type-mismatch "expr".
     """
-    tables = schema_json.get("tables", {}) or {}
+    if "." not in sql:
+        return _scan_dotless(sql)
+
+    toks: List[_Token] = []
+    quotes: List[int] = []  # token indexes of every "'"
+    for m in TOKEN_RE.finditer(sql):
+        k, t = m.lastgroup or "other", m.group()
+        if k == "quote":
+            quotes.append(len(toks))
+        toks.append((k, t, sys.intern(t.lower()) if k in _WORD_KINDS else t))
+    n_toks = len(toks)
+    toks.extend([_END] * 8)  # lookahead padding: no bounds checks below
+
+    alias_map: Dict[str, str] = {}
+    qualified_refs: List[Tuple[str, str]] = []
+    comparisons: List[_Quad] = []
+    likes: List[_Quad] = []
+    on_pairs: List[_Quad] = []
+    idents: List[str] = []
+    # lowercased words that appear right after "<word>." anywhere (overlaps allowed)
+    qualified_cols: Set[str] = set()
+
+    def closing_quote(j: int) -> int:
+        # index of the first quote token after j, or -1
+        q = bisect_right(quotes, j)
+        return quotes[q] if q < len(quotes) else -1
+
+    next_fj = next_qc = next_cl = next_lk = next_on = 0
+
+    for i in range(n_toks):
+        kind, text, low = toks[i]
+        if kind != "ident":
+            if kind == "word" and toks[i + 1][0] == "dot" and toks[i + 2][0] in _WORD_KINDS \
+                    and (low[0] == "_" or "a" <= low[0] <= "z"):
+                qualified_cols.add(toks[i + 2][2])
+            continue
+
+        idents.append(low)
+        k1 = toks[i + 1][0]
+
+        if k1 == "dot":
+            k2, c, c_l = toks[i + 2]
+            if k2 in _WORD_KINDS:
+                qualified_cols.add(c_l)
+
+            if k2 == "ident":
+                if i >= next_qc:
+                    qualified_refs.append((low, c_l))
+                    next_qc = i + 3
+
+                # alias.col OP literal
+                if i >= next_cl:
+                    j = i + 3
+                    if toks[j][0] == "ws":
+                        j += 1
+                    if toks[j][0] == "op":
+                        op = toks[j][1]
+                        j += 1
+                        if toks[j][0] == "ws":
+                            j += 1
+                        lk, lit, lit_l = toks[j]
+                        end = -1
+                        if lk == "quote":
+                            close = closing_quote(j)
+                            if close >= 0 and toks[close + 1][0] in _WORD_KINDS:
+                                lit = "".join(tok[1] for tok in toks[j:close + 1])
+                                end = close
+                        elif lk == "word" and lit.isdecimal():
+                            end = j
+                            if toks[j + 1][0] == "dot" and toks[j + 2][0] == "word" and toks[j + 2][1].isdecimal():
+                                lit = lit + "." + toks[j + 2][1]
+                                end = j + 2
+                        elif lk == "ident" and lit_l in _LIT_WORDS:
+                            end = j
+                        if end >= 0:
+                            comparisons.append((text, c, op, lit))
+                            next_cl = end + 1
+
+                # alias.col LIKE '...'
+                if i >= next_lk and toks[i + 3][0] == "ws" and toks[i + 4][0] == "ident" \
+                        and toks[i + 4][2] in ("like", "ilike") \
+                        and toks[i + 5][0] == "ws" and toks[i + 6][0] == "quote":
+                    close = closing_quote(i + 6)
+                    if close >= 0:
+                        lit = "".join(tok[1] for tok in toks[i + 6:close + 1])
+                        likes.append((text, c, toks[i + 4][2], lit))
+                        next_lk = close + 1
+            continue
+
+        # FROM/JOIN table [AS] alias
+        if (low == "from" or low == "join") and i >= next_fj \
+                and k1 == "ws" and toks[i + 2][0] == "ident" and toks[i + 3][0] == "ws":
+            table = toks[i + 2][2]
+            if toks[i + 4][0] == "ident" and toks[i + 4][2] == "as" \
+                    and toks[i + 5][0] == "ws" and toks[i + 6][0] == "ident":
+                alias_map[toks[i + 6][2]] = table
+                next_fj = i + 7
+            elif toks[i + 4][0] == "ident":
+                alias_map[toks[i + 4][2]] = table
+                next_fj = i + 5
+            continue
+
+        # ON a1.c1 = a2.c2
+        if low == "on" and i >= next_on and k1 == "ws" and toks[i + 2][0] == "ident" \
+                and toks[i + 3][0] == "dot" and toks[i + 4][0] == "ident":
+            j = i + 5
+            if toks[j][0] == "ws":
+                j += 1
+            if toks[j][0] == "op" and toks[j][1] == "=":
+                j += 1
+                if toks[j][0] == "ws":
+                    j += 1
+                if toks[j][0] == "ident" and toks[j + 1][0] == "dot":
+                    k2, c2, _ = toks[j + 2]
+                    if k2 == "word":
+                        prefix = IDENT_PREFIX_RE.match(c2)
+                        c2 = prefix.group() if prefix else ""
+                    if k2 == "ident" or (k2 == "word" and c2):
+                        on_pairs.append((toks[i + 2][1], toks[i + 4][1], toks[j][1], c2))
+                        next_on = j + 3
+
+    return {
+        "alias_map": alias_map,
+        "qualified_refs": qualified_refs,
+        "qualified_cols": qualified_cols,
+        "comparisons": comparisons,
+        "likes": likes,
+        "on_pairs": on_pairs,
+        "idents": idents,
+    }
+
+
+# -------------------------
+# Schema index (built once per schema, reused across queries)
+# -------------------------
+
+SCHEMA_INDEX_MAX = 32
+
+
+@dataclass(slots=True)
+class _SchemaIndex:
+    source: Optional[dict]  # the schema_json this was built from (identity-checked); None in pool workers
+    cols_by_table: Dict[str, Set[str]]
+    type_by_table: Dict[str, Dict[str, str]]
+    pk_map: Dict[str, Set[str]]
+    fk_edges: FrozenSet[Tuple[str, str, str, str]]
+    known_tables: Set[str]
+
+
+_SCHEMA_INDEX_CACHE: "OrderedDict[int, _SchemaIndex]" = OrderedDict()
+
+
+def _build_schema_index(schema_json: Dict[str, Any]) -> _SchemaIndex:
+    tables: Dict[str, Any] = (schema_json.get("tables", {}) or {})
+
+    cols_by_table = {
+        _name(t): set(_name(c) for c in (meta.get("columns", {}) or {}).keys())
+        for t, meta in tables.items()
+    }
+    type_by_table = {
+        _name(t): { _name(c): normalize_type(tp) for c, tp in (meta.get("columns", {}) or {}).items() }
+        for t, meta in tables.items()
+    }
 
     # FK edges: (from_table, from_col, to_table, to_col) all lower
     fk_edges = set()
     for t, meta in tables.items():
-        t_l = _lower(t)
+        t_l = _name(t)
         for fk in (meta.get("foreign_keys") or []):
-            fk_edges.add((t_l, _lower(fk.get("column")), _lower(fk.get("ref_table")), _lower(fk.get("ref_column"))))
+            fk_edges.add((t_l, _name(fk.get("column")), _name(fk.get("ref_table")), _name(fk.get("ref_column"))))
 
     # PK map for optional warnings (pk=pk same name join)
-    pk_map = { _lower(t): set(_lower(x) for x in (meta.get("primary_key") or [])) for t, meta in tables.items() }
+    pk_map = { _name(t): set(_name(x) for x in (meta.get("primary_key") or [])) for t, meta in tables.items() }
+
+    return _SchemaIndex(
+        source=schema_json,
+        cols_by_table=cols_by_table,
+        type_by_table=type_by_table,
+        pk_map=pk_map,
+        fk_edges=frozenset(fk_edges),
+        known_tables=set(cols_by_table.keys()),
+    )
 
-    invalid: List[dict] = []
-    warnings: List[str] = []
 
-    for m in ON_EQ_RE.finditer(sql):
-        a1 = _lower(m.group("a1"))
-        c1 = _lower(m.group("c1"))
-        a2 = _lower(m.group("a2"))
-        c2 = _lower(m.group("c2"))
+def schema_index(schema_json: Dict[str, Any]) -> _SchemaIndex:
+    """
+    Small LRU keyed by id(schema_json). The entry holds a reference to the
+    dict, so the id cannot be recycled while cached, and a hit is only
+    trusted if it is the very same object. Schemas are treated as
+    read-only once handed to the validator.
+    """
+    key = id(schema_json)
+    idx = _SCHEMA_INDEX_CACHE.get(key)
+    if idx is not None and idx.source is schema_json:
+        _SCHEMA_INDEX_CACHE.move_to_end(key)
+        return idx
+
+    idx = _build_schema_index(schema_json)
+    _SCHEMA_INDEX_CACHE[key] = idx
+    _SCHEMA_INDEX_CACHE.move_to_end(key)
+    while len(_SCHEMA_INDEX_CACHE) > SCHEMA_INDEX_MAX:
+        _SCHEMA_INDEX_CACHE.popitem(last=False)
+    return idx
+
+
+# -------------------------
+# Phase 3B: FK-aware JOIN validation
+# -------------------------
+
+def _iter_fk_join_issues(alias_map: Dict[str, str], on_pairs: List[_Quad],
+                         idx: _SchemaIndex) -> Iterator[Tuple[str, Any]]:
+    """
+    Yields ("join_warning", str) or ("invalid_join", dict) for each ON pair
+    that is not backed by a declared FK.
+    """
+    fk_edges = idx.fk_edges
+    pk_map = idx.pk_map
+
+    for a1, c1, a2, c2 in on_pairs:
+        a1, c1, a2, c2 = a1.lower(), c1.lower(), a2.lower(), c2.lower()
 
         if a1 not in alias_map or a2 not in alias_map:
-            warnings.append(f"JOIN uses unknown alias in ON: {a1}.{c1} = {a2}.{c2}")
+            yield "join_warning", f"JOIN uses unknown alias in ON: {a1}.{c1} = {a2}.{c2}"
             continue
 
-        t1 = _lower(alias_map[a1])
-        t2 = _lower(alias_map[a2])
+        t1 = alias_map[a1].lower()
+        t2 = alias_map[a2].lower()
 
         direct_ok = (t1, c1, t2, c2) in fk_edges
         reverse_ok = (t2, c2, t1, c1) in fk_edges
@@ -166,252 +465,398 @@ def fk_join_check(sql: str, schema_json: dict, alias_map: Dict[str, str]) -> dic
 
         # PK=PK same-name join can be intentional but suspicious
         if (c1 in pk_map.get(t1, set())) and (c2 in pk_map.get(t2, set())) and (c1 == c2):
-            warnings.append(
+            yield "join_warning", (
                 f"JOIN {t1}.{c1} = {t2}.{c2} is PK=PK with no FK declared; confirm intended relationship."
             )
             continue
 
-        invalid.append({
+        yield "invalid_join", {
             "left": f"{t1}.{c1}",
             "right": f"{t2}.{c2}",
             "reason": "No FK relationship found for this join condition"
-        })
+        }
+
+
+def fk_join_check(sql: Optional[str], schema_json: Dict[str, Any], alias_map: Dict[str, str],
+                  on_pairs: Optional[List[_Quad]] = None,
+                  index: Optional[_SchemaIndex] = None) -> Dict[str, Any]:
+    """
+    Validates JOIN ... ON a.col = b.col against schema_json foreign_keys.
+    on_pairs: (a1, c1, a2, c2) tuples already found by _scan(); if omitted,
+    sql is scanned here.
+    index: the caller's schema_index(schema_json), to skip the cache lookup.
+    Returns:
+      invalid_joins: list of join issues
+      join_warnings: list of non-fatal warnings
+    """
+    idx = index if index is not None else schema_index(schema_json)
+
+    invalid: List[dict] = []
+    warnings: List[str] = []
+
+    if on_pairs is None:
+        on_pairs = _scan(sql or "")["on_pairs"]
+
+    for kind, item in _iter_fk_join_issues(alias_map, on_pairs, idx):
+        if kind == "invalid_join":
+            invalid.append(item)
+        else:
+            warnings.append(item)
 
     return {"invalid_joins": invalid, "join_warnings": warnings}
 
 
+# -------------------------
+# Findings (slotted; turned into dicts only for the final result)
+# -------------------------
+
+@dataclass(slots=True)
+class UnknownColumn:
+    table: str
+    alias: str
+    column: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"table": self.table, "alias": self.alias, "column": self.column}
+
+
+@dataclass(slots=True)
+class TypeMismatch:
+    kind: str  # "comparison" | "equality" | "like"
+    expr: str
+    column_type: str
+    literal_type: str
+    reason: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "expr": self.expr,
+            "column_type": self.column_type,
+            "literal_type": self.literal_type,
+            "reason": self.reason,
+        }
+
+
+@dataclass(slots=True)
+class JoinTypeMismatch:
+    expr: str
+    left_type: str
+    right_type: str
+    reason: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": "join",
+            "expr": self.expr,
+            "left_type": self.left_type,
+            "right_type": self.right_type,
+            "reason": self.reason,
+        }
+
+
 # -------------------------
 # Phase 3: validate SQL against schema (3B + 3C)
 # -------------------------
 
-def validate_against_schema(sql: str, schema_json: dict) -> dict:
-    sql_raw = sql or ""
-    sql0 = _strip_strings(sql_raw)
-    sql_l = sql0.lower()
+# Bounded output: once a list is full the remaining work for it is skipped
+# and a note says the result was truncated.
+MAX_TYPE_MISMATCHES = 50
+MAX_UNKNOWN_ITEMS = 100
+
+# (kind, item) events from validate_against_schema_iter() -> result key
+ISSUE_KEYS = {
+    "table": "tables_detected",
+    "missing_table": "missing_tables",
+    "unknown_alias": "unknown_aliases",
+    "unknown_column": "unknown_columns",
+    "unqualified_column": "unqualified_columns_resolved",
+    "ambiguous_column": "ambiguous_unqualified_columns",
+    "unknown_identifier": "unknown_identifiers",
+    "type_mismatch": "type_mismatches",
+    "invalid_join": "invalid_joins",
+    "join_warning": "join_warnings",
+}
+_ISSUE_CAPS = {"unknown_column": MAX_UNKNOWN_ITEMS, "unknown_identifier": MAX_UNKNOWN_ITEMS}
 
-    tables: Dict[str, Any] = (schema_json.get("tables", {}) or {})
 
-    # Alias map
-    alias_map = build_alias_map(sql0)
+def _iter_type_mismatches(scan: Dict[str, Any], alias_map: Dict[str, str],
+                          type_by_table: Dict[str, Dict[str, str]]
+                          ) -> Iterator[Union[TypeMismatch, JoinTypeMismatch]]:
+    # alias.col spellings repeat a lot in one query; resolve each once
+    col_types: Dict[Tuple[str, str], Optional[str]] = {}
+
+    def col_type(alias: str, col: str) -> Optional[str]:
+        key = (alias, col)
+        if key in col_types:
+            return col_types[key]
+        a = alias.lower()
+        c = col.lower()
+        ct = type_by_table.get(alias_map[a], {}).get(c) if a in alias_map else None
+        col_types[key] = ct
+        return ct
+
+    # 1) Comparisons vs literals
+    for a, c, op, lit in scan["comparisons"]:
+        ct = col_type(a, c)
+        if ct is None:
+            continue
+
+        lt = literal_type(lit)
+        hit = _MISMATCH_TABLE.get((op, ct, lt))
+        if hit is not None:
+            kind, reason = hit
+            yield TypeMismatch(kind, f"{a}.{c} {op} {lit}", ct, lt, reason)
+
+    # 2) LIKE / ILIKE must be text
+    for a, c, op, lit in scan["likes"]:
+        ct = col_type(a, c)
+        if ct is None:
+            continue
+
+        if ct != "text":
+            yield TypeMismatch("like", f"{a}.{c} {op} {lit}", ct, "text", "LIKE/ILIKE used on non-text column")
+
+    # 3) Join type mismatch: ON a.col = b.col
+    for a1, c1, a2, c2 in scan["on_pairs"]:
+        t1 = col_type(a1, c1)
+        t2 = col_type(a2, c2)
+
+        if t1 is None or t2 is None:
+            continue
+
+        if t1 != t2 and t1 != "other" and t2 != "other":
+            yield JoinTypeMismatch(f"{a1}.{c1} = {a2}.{c2}", t1, t2, "Join compares different column types")
+
+
+def _walk_sql(scan: Dict[str, Any], idx: _SchemaIndex,
+              max_type_mismatches: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Yields (kind, item) for every finding, kinds as in ISSUE_KEYS. Items are
+    deduplicated here; caps are the consumer's job, except that the type
+    passes stop after max_type_mismatches and yield ("truncated", ...).
+    """
+    alias_map = scan["alias_map"]
+    cols_by_table = idx.cols_by_table
 
     # Detected tables from alias map values (best effort)
     tables_detected = sorted(set(alias_map.values()))
-    missing_tables = [t for t in tables_detected if t not in { _lower(x) for x in tables.keys() }]
-
-    # Build schema column sets + type maps
-    cols_by_table = {
-        _lower(t): set(_lower(c) for c in (meta.get("columns", {}) or {}).keys())
-        for t, meta in tables.items()
-    }
-    type_by_table = {
-        _lower(t): { _lower(c): normalize_type(tp) for c, tp in (meta.get("columns", {}) or {}).items() }
-        for t, meta in tables.items()
-    }
+    for t in tables_detected:
+        yield "table", t
+    for t in tables_detected:
+        if t not in idx.known_tables:
+            yield "missing_table", t
 
     # Qualified checks
-    unknown_aliases: List[str] = []
-    unknown_columns: List[dict] = []
-    unknown_identifiers: List[str] = []
-
-    qualified_refs = QUAL_COL_RE.findall(sql0)
-    for a, c in qualified_refs:
-        a_l = _lower(a)
-        c_l = _lower(c)
+    unknown_aliases = set()
+    unknown_identifiers = set()
 
+    # (alias, column) pairs, already lowercased by _scan
+    for a_l, c_l in scan["qualified_refs"]:
         if a_l not in alias_map:
             # could be schema.table style or db.table; treat as unknown alias if not a known table
             if a_l not in cols_by_table and a_l not in unknown_aliases:
-                unknown_aliases.append(a_l)
+                unknown_aliases.add(a_l)
+                yield "unknown_alias", a_l
             continue
 
         t = alias_map[a_l]  # already lower
         if c_l not in cols_by_table.get(t, set()):
-            unknown_columns.append({"table": t, "alias": a_l, "column": c_l})
+            yield "unknown_column", UnknownColumn(t, a_l, c_l)
             if c_l not in unknown_identifiers:
-                unknown_identifiers.append(c_l)
+                unknown_identifiers.add(c_l)
+                yield "unknown_identifier", c_l
 
     # Unqualified column resolution
     # Candidate tokens = identifiers that are not keywords, functions, aliases, or table names
-    tokens = IDENT_RE.findall(sql0)
-    candidates: List[str] = []
-    known_tables = set(cols_by_table.keys())
-    known_aliases = set(alias_map.keys())
-
-    for tok in tokens:
-        tok_l = _lower(tok)
-        if tok_l in SQL_KEYWORDS or tok_l in SQL_FUNCTIONS:
-            continue
-        if tok_l in known_aliases:
-            continue
-        if tok_l in known_tables:
-            continue
-        # skip if it's a number-like token (IDENT_RE won't match digits-only, but keep safe)
-        candidates.append(tok_l)
-
-    detected_tables_cols = [(t, cols_by_table.get(t, set())) for t in tables_detected if t in cols_by_table]
-
-    unqualified_columns_resolved: List[dict] = []
-    ambiguous_unqualified_columns: List[dict] = []
-    seen_unqualified = set()
+    # (deduplicated in first-seen order so the resolved lists stay stable)
+    known_tables = idx.known_tables
+    known_aliases = alias_map.keys()
+    candidates = [
+        tok_l for tok_l in dict.fromkeys(scan["idents"])
+        if tok_l not in SQL_KEYWORDS and tok_l not in SQL_FUNCTIONS
+        and tok_l not in known_aliases and tok_l not in known_tables
+    ]
+
+    # column -> detected tables that have it (in tables_detected order)
+    col_to_tables: Dict[str, List[str]] = {}
+    for t in tables_detected:
+        for c in cols_by_table.get(t, ()):
+            col_to_tables.setdefault(c, []).append(t)
+
+    qualified_cols = scan["qualified_cols"]
+    matched = set()
 
     for tok_l in candidates:
-        if tok_l in seen_unqualified:
-            continue
-        seen_unqualified.add(tok_l)
-
         # If used as part of alias.col already, skip
-        if re.search(rf"\b[a-zA-Z_]\w*\.{re.escape(tok_l)}\b", sql_l):
+        if tok_l in qualified_cols:
             continue
 
-        owners = [t for (t, cols) in detected_tables_cols if tok_l in cols]
+        owners = col_to_tables.get(tok_l, ())
         if len(owners) == 1:
-            unqualified_columns_resolved.append({"column": tok_l, "table": owners[0]})
+            matched.add(tok_l)
+            yield "unqualified_column", {"column": tok_l, "table": owners[0]}
         elif len(owners) > 1:
-            ambiguous_unqualified_columns.append({"column": tok_l, "tables": owners})
+            matched.add(tok_l)
+            yield "ambiguous_column", {"column": tok_l, "tables": list(owners)}
 
     # Unknown identifiers (best effort):
     # anything that is not a keyword/function/alias/table and not resolved as a column
-    resolved_cols = {x["column"] for x in unqualified_columns_resolved}
-    ambiguous_cols = {x["column"] for x in ambiguous_unqualified_columns}
-    for tok_l in seen_unqualified:
-        if tok_l in resolved_cols or tok_l in ambiguous_cols:
+    for tok_l in candidates:
+        if tok_l in matched:
             continue
         # keep it light: don't add too much noise
         if tok_l not in unknown_identifiers:
-            unknown_identifiers.append(tok_l)
+            unknown_identifiers.add(tok_l)
+            yield "unknown_identifier", tok_l
 
-    # ---------------------------
     # Phase 3C: Type-aware checks
-    # ---------------------------
-    type_mismatches: List[dict] = []
+    n = 0
+    for mismatch in _iter_type_mismatches(scan, alias_map, idx.type_by_table):
+        if max_type_mismatches is not None and n >= max_type_mismatches:
+            yield "truncated", "type_mismatches"
+            break
+        n += 1
+        yield "type_mismatch", mismatch
 
-    def col_type(alias: str, col: str) -> Optional[str]:
-        a = _lower(alias)
-        c = _lower(col)
-        if a not in alias_map:
-            return None
-        t = alias_map[a]
-        return type_by_table.get(t, {}).get(c)
+    # Phase 3B: FK-aware join check
+    yield from _iter_fk_join_issues(alias_map, scan["on_pairs"], idx)
 
-    # 1) Comparisons vs literals
-    for m in QUAL_COMP_LIT_RE.finditer(sql0):
-        a = m.group("a")
-        c = m.group("c")
-        op = m.group("op").lower()
-        lit = m.group("lit")
 
-        ct = col_type(a, c)
-        if ct is None:
-            continue
+def validate_against_schema_iter(sql: Optional[str], schema_json: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming form of validate_against_schema(): yields (kind, item) pairs
+    as they are found, uncapped (see ISSUE_KEYS for the kinds). Lets batch
+    callers stop at the first hard error without building whole results.
+    Unknown columns and type mismatches arrive as UnknownColumn /
+    TypeMismatch / JoinTypeMismatch; call .to_dict() for the JSON shape.
+    """
+    sql0 = _strip_strings(sql or "")
+    yield from _walk_sql(_scan(sql0), schema_index(schema_json))
 
-        lt = literal_type(lit)
 
-        if lt == "null":
-            continue
+def validate_against_schema(sql: Optional[str], schema_json: Dict[str, Any]) -> Dict[str, Any]:
+    return _validate(sql, schema_index(schema_json))
 
-        if op in (">", "<", ">=", "<="):
-            if ct != "numeric":
-                type_mismatches.append({
-                    "kind": "comparison",
-                    "expr": f"{a}.{c} {op} {lit}",
-                    "column_type": ct,
-                    "literal_type": lt,
-                    "reason": "Non-numeric column used with numeric comparison operator"
-                })
-            continue
 
-        if op in ("=", "!=", "<>"):
-            if ct in ("numeric", "text", "boolean") and lt in ("numeric", "text", "boolean"):
-                if ct != lt:
-                    type_mismatches.append({
-                        "kind": "equality",
-                        "expr": f"{a}.{c} {op} {lit}",
-                        "column_type": ct,
-                        "literal_type": lt,
-                        "reason": "Column type does not match literal type"
-                    })
+def _validate(sql: Optional[str], idx: _SchemaIndex) -> Dict[str, Any]:
+    sql_raw = sql or ""
+    sql0 = _strip_strings(sql_raw)
 
-    # 2) LIKE / ILIKE must be text
-    for m in QUAL_LIKE_RE.finditer(sql0):
-        a = m.group("a")
-        c = m.group("c")
-        op = m.group("op").lower()
-        lit = m.group("lit")
+    # One lexer pass collects every structure the checks below need
+    scan = _scan(sql0)
 
-        ct = col_type(a, c)
-        if ct is None:
+    found: Dict[str, List[Any]] = {key: [] for key in ISSUE_KEYS.values()}
+    truncated = False
+    for kind, item in _walk_sql(scan, idx, MAX_TYPE_MISMATCHES):
+        if kind == "truncated":
+            truncated = True
             continue
-
-        if ct != "text":
-            type_mismatches.append({
-                "kind": "like",
-                "expr": f"{a}.{c} {op} {lit}",
-                "column_type": ct,
-                "literal_type": "text",
-                "reason": "LIKE/ILIKE used on non-text column"
-            })
-
-    # 3) Join type mismatch: ON a.col = b.col
-    for m in ON_EQ_RE.finditer(sql0):
-        a1 = m.group("a1")
-        c1 = m.group("c1")
-        a2 = m.group("a2")
-        c2 = m.group("c2")
-
-        t1 = col_type(a1, c1)
-        t2 = col_type(a2, c2)
-
-        if t1 is None or t2 is None:
+        bucket = found[ISSUE_KEYS[kind]]
+        cap = _ISSUE_CAPS.get(kind)
+        if cap is not None and len(bucket) >= cap:
+            truncated = True
             continue
-
-        if t1 != t2 and t1 != "other" and t2 != "other":
-            type_mismatches.append({
-                "kind": "join",
-                "expr": f"{a1}.{c1} = {a2}.{c2}",
-                "left_type": t1,
-                "right_type": t2,
-                "reason": "Join compares different column types"
-            })
-
-    # Phase 3B: FK-aware join check
-    fk = fk_join_check(sql0, schema_json, alias_map)
+        bucket.append(item)
 
     # Notes
     notes: List[str] = []
-    if missing_tables:
+    if found["missing_tables"]:
         notes.append("One or more referenced tables are missing from the schema.")
-    if unknown_columns:
+    if found["unknown_columns"]:
         notes.append("One or more qualified columns (alias.column) do not exist in the referenced table.")
-    if unknown_aliases:
+    if found["unknown_aliases"]:
         notes.append("One or more aliases referenced in SQL were not defined in FROM/JOIN.")
-    if ambiguous_unqualified_columns:
+    if found["ambiguous_unqualified_columns"]:
         notes.append("Some unqualified column names are ambiguous; prefer alias.column.")
-    if fk["invalid_joins"]:
+    if found["invalid_joins"]:
         notes.append("One or more JOIN conditions do not match any FK relationship.")
-    if type_mismatches:
+    if found["type_mismatches"]:
         notes.append("One or more comparisons/joins appear to use incompatible data types.")
+    if truncated:
+        notes.append("Some issue lists hit their size cap; only the first findings are listed.")
 
     return {
-        "tables_detected": tables_detected,
-        "missing_tables": missing_tables,
-        "alias_map": alias_map,
-        "unknown_aliases": unknown_aliases,
-        "unknown_columns": unknown_columns,
-        "unqualified_columns_resolved": unqualified_columns_resolved,
-        "ambiguous_unqualified_columns": ambiguous_unqualified_columns,
-        "unknown_identifiers": unknown_identifiers,
-        "invalid_joins": fk["invalid_joins"],
-        "join_warnings": fk["join_warnings"],
-        "type_mismatches": type_mismatches[:50],
+        "tables_detected": found["tables_detected"],
+        "missing_tables": found["missing_tables"],
+        "alias_map": scan["alias_map"],
+        "unknown_aliases": found["unknown_aliases"],
+        "unknown_columns": [u.to_dict() for u in found["unknown_columns"]],
+        "unqualified_columns_resolved": found["unqualified_columns_resolved"],
+        "ambiguous_unqualified_columns": found["ambiguous_unqualified_columns"],
+        "unknown_identifiers": found["unknown_identifiers"],
+        "invalid_joins": found["invalid_joins"],
+        "join_warnings": found["join_warnings"],
+        "type_mismatches": [m.to_dict() for m in found["type_mismatches"]],
         "notes": notes,
     }
 
 
+# -------------------------
+# Batch validation
+# -------------------------
+
+# Below this a private pool costs more to start (~8 ms) than it saves; on
+# a single core it never pays off, so that case always stays in-process.
+PARALLEL_VALIDATE_MIN_SQLS = 1024
+VALIDATE_CHUNK_SQLS = 128
+
+
+def _validate_chunk(idx: _SchemaIndex, sqls: List[Optional[str]]) -> List[Dict[str, Any]]:
+    return [_validate(sql, idx) for sql in sqls]
+
+
+# Set in each private pool worker by _init_validate_worker()
+_worker_index: Optional[_SchemaIndex] = None
+
+
+def _init_validate_worker(idx: _SchemaIndex) -> None:
+    global _worker_index
+    _worker_index = idx
+
+
+def _validate_worker_chunk(sqls: List[Optional[str]]) -> List[Dict[str, Any]]:
+    assert _worker_index is not None
+    return _validate_chunk(_worker_index, sqls)
+
+
+def validate_batch(sqls: List[Optional[str]], schema_json: Dict[str, Any],
+                   workers: Optional[int] = None,
+                   executor: Optional[Executor] = None) -> List[Dict[str, Any]]:
+    """
+    validate_against_schema() for many statements against one schema, in
+    order. The schema index is built once. Pass a long-lived executor to
+    reuse its workers across calls (the index then travels with each chunk);
+    otherwise only very large batches on multi-core hosts get a private
+    process pool, whose workers receive the index once at start-up.
+    workers=1 keeps everything in-process.
+    """
+    idx = schema_index(schema_json)
+    if workers == 1:
+        return _validate_chunk(idx, sqls)
+    if executor is None and (len(sqls) < PARALLEL_VALIDATE_MIN_SQLS
+                             or (workers or os.cpu_count() or 1) < 2):
+        return _validate_chunk(idx, sqls)
+
+    # workers only need the lookup tables, not a pickled copy of schema_json
+    slim = replace(idx, source=None)
+    chunks = [sqls[i:i + VALIDATE_CHUNK_SQLS] for i in range(0, len(sqls), VALIDATE_CHUNK_SQLS)]
+
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 initializer=_init_validate_worker, initargs=(slim,)) as ex:
+            return [r for rs in ex.map(_validate_worker_chunk, chunks) for r in rs]
+
+    futures = [executor.submit(_validate_chunk, slim, chunk) for chunk in chunks]
+    return [r for f in futures for r in f.result()]
+
+
 # -------------------------
 # Phase 3D: Clear error classification
 # -------------------------
 
-def classify_issue(validation: dict, question: str, schema_json: dict) -> dict:
+def classify_issue(validation: Dict[str, Any], question: Optional[str],
+                   schema_json: Dict[str, Any]) -> Dict[str, Any]:
     """
     class: 'schema_issue' | 'ai_issue' | 'user_issue' | 'ok'
     action: 'stop' | 'retry_ai' | 'ask_user'
@@ -428,8 +873,6 @@ def classify_issue(validation: dict, question: str, schema_json: dict) -> dict:
     if not hard_signals:
         return {"class": "ok", "reason": "No major validation issues detected.", "action": "stop"}
 
-    q = (question or "").lower()
-
     # Missing tables -> schema issue (or AI hallucination). If user asked for them explicitly, it's schema; otherwise AI.
     if validation.get("missing_tables"):
         return {
@@ -442,7 +885,10 @@ def classify_issue(validation: dict, question: str, schema_json: dict) -> dict:
     if validation.get("unknown_columns"):
         unknown_cols = {c.get("column", "") for c in validation.get("unknown_columns", []) if isinstance(c, dict)}
         unknown_cols = {str(x).lower() for x in unknown_cols if x}
-        if any(uc in q for uc in unknown_cols):
+        # Whole identifier words of the question; one set test instead of a
+        # substring scan of the question per unknown column
+        question_words = set(QUESTION_WORD_RE.findall((question or "").lower()))
+        if not unknown_cols.isdisjoint(question_words):
             return {
                 "class": "schema_issue",
                 "reason": "Requested column(s) appear not to exist in the schema.",